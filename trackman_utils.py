@@ -1,180 +1,478 @@
+import functools
+import inspect
+import warnings
+
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 import numpy as np
 import pandas as pd
 
+try:
+    import numba
+    _prange = numba.prange
+except ImportError:  # numba is optional, the kernels below fall back to numpy
+    numba = None
+    _prange = range
+
+
+# statcast descriptions / events
+_STATCAST_WHIFF = frozenset({'swinging_strike', 'swinging_strike_blocked'})
+_STATCAST_SWING = _STATCAST_WHIFF | {'hit_into_play', 'hit_into_play_no_out', 'hit_into_play_score', 'foul_tip',
+                                     'foul', 'foul_bunt'}
+_STATCAST_PUTAWAY = _STATCAST_WHIFF | {'called_strike'}
+_STATCAST_PA_ENDING = frozenset({'hit_by_pitch', 'hit_into_play', 'hit_into_play_no_out', 'hit_into_play_score'})
+_STATCAST_K = frozenset({'strikeout'})
+_STATCAST_BB = frozenset({'walk'})
+_STATCAST_K_OR_BB = _STATCAST_K | _STATCAST_BB
+
+# Trackman pitch calls
+_TRACKMAN_WHIFF = frozenset({'StrikeSwinging'})
+_TRACKMAN_SWING = frozenset({'StrikeSwinging', 'FoulBall', 'InPlay'})
+_TRACKMAN_PUTAWAY = frozenset({'StrikeSwinging', 'StrikeCalled'})
+_TRACKMAN_CALLED = frozenset({'StrikeCalled'})
+
+_UNDEFINED = frozenset({'Undefined'})
+
+# low-cardinality string columns, stored as categories
+_CATEGORICAL_COLUMNS = ('description', 'events', 'pitch_call', 'play_result', 'k_or_bb', 'tagged_pitch_type',
+                        'pitch_type')
+# numeric columns read by this module, and the narrowest dtype that holds them; plate locations stay float64 so they
+# bin and compare against the height bands and zone edges exactly as in the dataframe
+_NUMERIC_COLUMNS = {'strikes': np.int8, 'pitcher': np.int32, 'plate_loc_height': np.float64,
+                    'plate_loc_side': np.float64, 'woba_value': np.float64, 'woba_denom': np.float64}
+
+# "universal" strike zone, in feet (see notebook)
+_ZONE_BOTTOM = 18.29/12
+_ZONE_HEIGHT = 25.79/12
+_ZONE_LEFT = -9.97/12
+_ZONE_WIDTH = 19.94/12
+
+
+@functools.lru_cache(maxsize=128)
+def _category_lookup(categories, values):
+    """ Given a tuple of categories in code order and a frozenset of values, build a boolean table of which categories
+    are in values. Missing values have code -1, so the table carries a trailing False for them. Cached since slices of
+    a frame share its categories; the key is the ordered tuple because unordered dtypes with the same categories in a
+    different order compare (and hash) equal.
+    
+    Returns: numpy array of bools, one longer than the categories. """
+    return np.append(pd.Index(categories).isin(values), False)
+
+
+def _in_set(col, values):
+    """ Given a column, return a boolean numpy mask of which entries are in values (a frozenset). The lookup is done
+    once per category and broadcast through the category codes, so string values are never rehashed per row.
+    
+    Returns: numpy array of bools. """
+    if not isinstance(col.dtype, pd.CategoricalDtype):
+        col = col.astype('category')
+    return _category_lookup(tuple(col.cat.categories), values)[col.cat.codes.to_numpy()]
+
+
+def _map_codes(col, values):
+    """ Given a column and a dict, return the mapped value of each entry, looked up once per category. Entries that
+    are missing or not in values map to NaN.
+    
+    Returns: numpy array of floats. """
+    if not isinstance(col.dtype, pd.CategoricalDtype):
+        col = col.astype('category')
+    lookup = np.array([values.get(cat, float('NaN')) for cat in col.cat.categories] + [float('NaN')], dtype=float)
+    return lookup[col.cat.codes.to_numpy()]
+
+
+def _find_stack_level():
+    """ Find the stack level of the first caller outside this module and pandas, so a warning raised here through
+    df.apply() points at the user's line rather than at pandas internals (as pandas' own find_stack_level does).
+    
+    Returns: int, for use as warnings.warn(stacklevel=...) by the function calling this one. """
+    frame = inspect.currentframe()
+    level = 0
+    try:
+        while frame is not None:
+            module = frame.f_globals.get('__name__', '')
+            if module != __name__ and module != 'pandas' and not module.startswith('pandas.'):
+                break
+            frame = frame.f_back
+            level += 1
+    finally:
+        del frame
+    return level
+
+
+def _from_row(func, row, *args, **kwargs):
+    """ Given one of the frame-level parse_* functions and a single row (as passed by df.apply(axis=1)), warn that the
+    whole dataframe should be passed instead and return func's result for that row. """
+    warnings.warn(func.__name__ + '() was called on a single row; pass the whole dataframe instead of using '
+                  'apply(axis=1)', pd.errors.PerformanceWarning, stacklevel=_find_stack_level())
+    return func(row.to_frame().T, *args, **kwargs).iloc[0]
 
-def agg_statcast_pitchers(pitcher, min_batters_faced):
+
+def categorize(df, columns=_CATEGORICAL_COLUMNS):
+    """ Given a freshly loaded Trackman or statcast dataframe, convert its low-cardinality string columns to category
+    dtype so downstream comparisons, lookups and groupbys work on integer codes, and store the strike count as int8.
+    Columns that are not present are skipped. Group by these columns with observed=True.
+    
+    Returns: the same dataframe, converted in place. """
+    for col in columns:
+        if col in df:
+            df[col] = df[col].astype('category')
+    if 'strikes' in df and df['strikes'].notna().all():
+        df['strikes'] = df['strikes'].astype(np.int8)
+    return df
+
+
+class PitchArrays:
+    """ Struct-of-arrays copy of just the columns this module reads from a Trackman or statcast dataframe: string
+    columns as Categoricals (small integer codes plus categories), numeric ones as int8 / int32 / float64 arrays.
+    Build it once with PitchArrays.from_frame(df) and pass it in place of the dataframe to agg_statcast_pitchers(),
+    count_calls_by_pitch(), compute_putaway(), parse_whiff_statcast(), parse_prop(), pitch_call_rates() and
+    whiff_by_height(); it supports the column lookups they do. """
+    
+    def __init__(self, columns):
+        self.columns = columns
+        
+    @classmethod
+    def from_frame(cls, df):
+        """ Given a Trackman or statcast dataframe, copy out the columns this module uses. Columns that are not
+        present are skipped, and integer columns with missing values keep their original dtype rather than having
+        NaN cast to an arbitrary integer.
+        
+        Returns: PitchArrays. """
+        columns = {}
+        for col in _CATEGORICAL_COLUMNS:
+            if col in df:
+                columns[col] = df[col].astype('category').array
+        for col, dtype in _NUMERIC_COLUMNS.items():
+            if col in df:
+                if np.issubdtype(dtype, np.integer) and df[col].isna().any():
+                    columns[col] = df[col].to_numpy()
+                else:
+                    columns[col] = df[col].to_numpy(dtype=dtype)
+        return cls(columns)
+    
+    def __contains__(self, col):
+        return col in self.columns
+    
+    def __getitem__(self, col):
+        return pd.Series(self.columns[col], copy=False, name=col)
+    
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+    
+    
+def _group_sums(codes, n_groups, values, n_chunks):
+    """ Given group codes in [0, n_groups) for each row and a 2D array of values, sum the rows of values for each
+    group with a scatter-add straight on the codes (no sort). Rows are split into n_chunks contiguous chunks, each
+    accumulated into its own partial table, so with numba the chunks run across cores.
+    
+    Returns: 2D numpy array of shape (n_groups, number of value columns). """
+    n_rows, n_cols = values.shape
+    partial = np.zeros((n_chunks, n_groups, n_cols))
+    chunk = (n_rows + n_chunks - 1)//n_chunks
+    for c in _prange(n_chunks):
+        for i in range(c*chunk, min((c+1)*chunk, n_rows)):
+            g = codes[i]
+            for k in range(n_cols):
+                partial[c, g, k] += values[i, k]
+    return partial.sum(axis=0)
+
+
+if numba is not None:
+    _group_sums = numba.njit(parallel=True, cache=True)(_group_sums)
+    
+    
+def _sum_by_group(codes, n_groups, values):
+    """ Given group codes in [0, n_groups) for each row and a 2D array of values, sum the values per group.
+    
+    Returns: 2D numpy array of shape (n_groups, number of value columns). """
+    if numba is None:
+        return np.column_stack([np.bincount(codes, weights=values[:, k], minlength=n_groups)
+                                for k in range(values.shape[1])])
+    return _group_sums(codes, n_groups, np.ascontiguousarray(values), numba.get_num_threads())
+
+
+def agg_statcast_pitchers(all_stats, min_batters_faced):
     """ 
-    For a given pitcher with statcast data from Baseball Savant, compute stats. Function is meant to be applied on
-    the dataframe with all events from 2020 which is grouped by pitcher.
+    For each pitcher with statcast data from Baseball Savant, compute stats. Function is meant to be called on
+    the dataframe with all events from 2020. Appearances are counted first, and the remaining counts are aggregated
+    together with the wOBA sums in a single pass over the qualified pitchers only, in parallel across pitchers when
+    numba is installed.
     
-    pitcher [Pandas dataframe]: Dataframe of events for a single pitcher.
+    all_stats [Pandas dataframe or PitchArrays]: Dataframe of events for all pitchers.
     min_batters_faced [int]: only pitchers who have faced >= min_batters_faced will have non-NAN results.
     
-    Returns: pandas.Series object with putaway, whiff, k, bb, and woba.
+    Returns: pandas.DataFrame indexed by pitcher with putaway, whiff, k, bb, and woba.
     """
-    appearances = len(pitcher[(pitcher['description'].isin(['hit_by_pitch','hit_into_play','hit_into_play_no_out',
-     'hit_into_play_score'])) | (pitcher['events'].isin(['strikeout', 'walk']))])
-    if appearances < min_batters_faced:
-        return pd.Series({'putaway_rate': float('NaN'), 'whiff_rate': float('NaN'), 'k_rate': float('NaN'), 
-                         'bb_rate': float('NaN'), 'woba': float('NaN')})
-    pitcher_2str = pitcher[pitcher['strikes']==2]
-    putaways = len(pitcher_2str[pitcher_2str['description'].isin(['swinging_strike','swinging_strike_blocked', 
-                                                                     'called_strike'])])
-    putaway_rate = putaways/len(pitcher_2str)
-    whiffs = len(pitcher[pitcher['description'].isin(['swinging_strike','swinging_strike_blocked'])])
-    swings = len(pitcher[pitcher['description'].isin(['swinging_strike','swinging_strike_blocked',
-                    'hit_into_play', 'hit_into_play_no_out', 'hit_into_play_score', 'foul_tip', 'foul', 'foul_bunt'])])
-    whiff_rate = whiffs/swings
-    strikeouts = len(pitcher[pitcher['events']=='strikeout'])
-    k_rate = strikeouts/appearances
-    walks = len(pitcher[pitcher['events']=='walk'])
-    bb_rate = walks/appearances
-    woba = pitcher['woba_value'].sum()/pitcher['woba_denom'].sum()
-    return pd.Series({'putaway_rate': putaway_rate, 'whiff_rate': whiff_rate, 'k_rate': k_rate, 'bb_rate': bb_rate, 
-                      'woba': woba})
-
-def percentile(val, stats_by_pitcher, stat):
+    codes, pitchers = pd.factorize(all_stats['pitcher'], sort=True)
+    # PitchArrays stores pitcher ids as int32; report them as int64 like the dataframe
+    pitchers = pd.Index(pitchers.astype(np.int64) if pitchers.dtype.kind in 'iu' else pitchers, name='pitcher')
+    has_pitcher = codes >= 0
+    desc = all_stats['description'].astype('category')
+    events = all_stats['events'].astype('category')
+    is_pa = _in_set(desc, _STATCAST_PA_ENDING) | _in_set(events, _STATCAST_K_OR_BB)
+    all_appearances = np.bincount(codes[has_pitcher], weights=is_pa[has_pitcher], minlength=len(pitchers))
+    
+    # only aggregate the rest for pitchers who qualify; rows without a pitcher are dropped, as groupby does
+    qualified = all_appearances >= min_batters_faced
+    keep = has_pitcher & qualified[codes]
+    codes = (np.cumsum(qualified) - 1)[codes[keep]]
+    desc, events = desc[keep], events[keep]
+    is_2str = all_stats['strikes'].to_numpy()[keep] == 2
+    # wOBA sums skip missing values, as pandas sum() does
+    values = np.column_stack([is_2str,
+                              is_2str & _in_set(desc, _STATCAST_PUTAWAY),
+                              _in_set(desc, _STATCAST_WHIFF),
+                              _in_set(desc, _STATCAST_SWING),
+                              _in_set(events, _STATCAST_K),
+                              _in_set(events, _STATCAST_BB),
+                              np.nan_to_num(all_stats['woba_value'].to_numpy(dtype=np.float64)[keep]),
+                              np.nan_to_num(all_stats['woba_denom'].to_numpy(dtype=np.float64)[keep])])
+    sums = _sum_by_group(codes, qualified.sum(), values).T
+    two_strikes, putaways, whiffs, swings, ks, bbs, woba_values, woba_denoms = sums
+    appearances = all_appearances[qualified]
+    stats = np.full((len(pitchers), 5), float('NaN'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats[qualified] = np.column_stack([putaways/two_strikes, whiffs/swings, ks/appearances, bbs/appearances,
+                                            woba_values/woba_denoms])
+    return pd.DataFrame(stats, index=pitchers, columns=['putaway_rate', 'whiff_rate', 'k_rate', 'bb_rate', 'woba'])
+
+def percentile(val, stats_by_pitcher, stat=None):
     """ Calculates percentile of val for stat across all qualified pitchers.
     
+    stats_by_pitcher [Pandas dataframe or numpy array]: stats per pitcher, or an already-sorted array of values for
+        stat (see sorted_stat()) so repeated lookups don't re-sort.
+    
     Returns: Float representing percentile. """
-    sorted_rates = stats_by_pitcher.sort_values(stat, ascending=True)
-    i=0
-    while val > sorted_rates.iloc[i][stat]:
-        i += 1
-    return i/len(sorted_rates)
+    if isinstance(stats_by_pitcher, np.ndarray):
+        sorted_rates = stats_by_pitcher
+    else:
+        sorted_rates = sorted_stat(stats_by_pitcher, stat)
+    return np.searchsorted(sorted_rates, val, side='left')/sorted_rates.size
+
+
+def sorted_stat(stats_by_pitcher, stat):
+    """ Sorted numpy array of stat across all pitchers, for use with percentile().
+    
+    Returns: numpy array sorted ascending. """
+    sorted_rates = stats_by_pitcher[stat].to_numpy(dtype=float, copy=True)
+    sorted_rates.sort()
+    return sorted_rates
+
+
+def _count_pitch_calls(pitch_codes, call_codes, n_pitches, n_calls):
+    """ Given category codes for pitch type and pitch call, count every (pitch type, pitch call) pair in a single
+    loop. Rows with a missing pitch type or pitch call (code -1) are skipped, as groupby([pitch, call]).size() drops
+    them.
+    
+    Returns: 2D numpy array of int32 counts, of shape (n_pitches, n_calls). """
+    counts = np.zeros((n_pitches, n_calls), dtype=np.int32)
+    for i in range(len(pitch_codes)):
+        p = pitch_codes[i]
+        c = call_codes[i]
+        if p < 0 or c < 0:
+            continue
+        counts[p, c] += 1
+    return counts
+
+
+if numba is not None:
+    _count_pitch_calls = numba.njit(cache=True)(_count_pitch_calls)
+else:
+    def _count_pitch_calls(pitch_codes, call_codes, n_pitches, n_calls):
+        keep = (pitch_codes >= 0) & (call_codes >= 0)
+        flat = pitch_codes[keep].astype(np.intp)*n_calls + call_codes[keep]
+        return np.bincount(flat, minlength=n_pitches*n_calls).reshape(n_pitches, n_calls).astype(np.int32)
+
+
+def count_calls_by_pitch(df, statcast=False):
+    """ Given a dataframe of pitches, count how often each pitch call occurs for each pitch type, as a dense matrix
+    built from the category codes in one pass. Use this as calls_by_pitch below.
+    
+    Returns: pandas.DataFrame of int32 counts, indexed by pitch type with one column per pitch call. """
+    if not statcast:
+        pitch_col, call_col = 'tagged_pitch_type', 'pitch_call'
+    else:
+        pitch_col, call_col = 'pitch_type', 'description'
+    pitch = df[pitch_col].astype('category')
+    call = df[call_col].astype('category')
+    counts = _count_pitch_calls(pitch.cat.codes.to_numpy(), call.cat.codes.to_numpy(), len(pitch.cat.categories),
+                                len(call.cat.categories))
+    return pd.DataFrame(counts, index=pd.Index(pitch.cat.categories, name=pitch_col),
+                        columns=pd.Index(call.cat.categories, name=call_col))
+
+
+def _as_call_matrix(calls_by_pitch):
+    """ Given calls_by_pitch from count_calls_by_pitch(), or a groupby([pitch, call]).size() Series, return it as a
+    dense pitch x call matrix.
+    
+    Returns: pandas.DataFrame of counts. """
+    if isinstance(calls_by_pitch, pd.Series):
+        return calls_by_pitch.unstack(fill_value=0)
+    return calls_by_pitch
+
+
+def _call_rates(calls_by_pitch, statcast=False):
+    """ Given calls_by_pitch counts, compute whiff and putaway rate for every pitch type from the columns of the
+    matrix in each outcome set. Rates are NaN for pitch types without swings (whiff) or pitches (putaway).
+    
+    Returns: pandas.DataFrame indexed by pitch type with whiff_rate and putaway_rate. """
+    if not statcast:
+        putaway_calls, whiff_calls, swing_calls = _TRACKMAN_PUTAWAY, _TRACKMAN_WHIFF, _TRACKMAN_SWING
+    else:
+        putaway_calls, whiff_calls, swing_calls = _STATCAST_PUTAWAY, _STATCAST_WHIFF, _STATCAST_SWING
+    calls_by_pitch = _as_call_matrix(calls_by_pitch)
+    counts = calls_by_pitch.to_numpy()
+    calls = calls_by_pitch.columns
+    whiffs = counts[:, calls.isin(whiff_calls)].sum(axis=1)
+    swings = counts[:, calls.isin(swing_calls)].sum(axis=1)
+    putaways = counts[:, calls.isin(putaway_calls)].sum(axis=1)
+    totals = counts.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        whiff_rate = np.where(swings > 0, whiffs/swings, np.nan)
+        putaway_rate = np.where(totals > 0, putaways/totals, np.nan)
+    return pd.DataFrame({'whiff_rate': whiff_rate, 'putaway_rate': putaway_rate}, index=calls_by_pitch.index)
 
 
 def compute_putaway(df, calls_by_pitch):
-    """ Given a dataframe df representing a pitcher's events and a groupby (by pitch), compute putaway rate. 
+    """ Given a dataframe df representing a pitcher's events and calls_by_pitch counts, compute putaway rate. 
     
     Returns: Float representing putaway rate. """
-    total = 0
-    total_k = 0
-    for pitch in set(df['tagged_pitch_type']):
-        if pitch in calls_by_pitch:
-            for row in calls_by_pitch[pitch].index:
-                if row == 'StrikeSwinging' or row == 'StrikeCalled':
-                    total_k += calls_by_pitch[pitch][row]
-                total += calls_by_pitch[pitch][row]
+    calls_by_pitch = _as_call_matrix(calls_by_pitch)
+    counts = calls_by_pitch.to_numpy()[calls_by_pitch.index.isin(df['tagged_pitch_type'].unique())]
+    total_k = counts[:, calls_by_pitch.columns.isin(_TRACKMAN_PUTAWAY)].sum()
+    total = counts.sum()
     putaway_rate = total_k/total
     return putaway_rate
 
 
-def parse_woba(row, weights):
-    """ Given a row representing a single event, and wOBA weights, return the wOBA value for row. 
+def _parse_event_value(df, values, undefined):
+    """ Given a dataframe of events and a mapping from play_result / k_or_bb outcomes to values, return the value of
+    each event: its play_result if defined, else its k_or_bb if defined, else undefined.
     
-    Returns: Float representing wOBA. """
-    if row.play_result != 'Undefined':
-        return weights[row.play_result]
-    else:
-        if row.k_or_bb != 'Undefined':
-            return weights[row.k_or_bb]
-        else:
-            return float('NaN')
+    Returns: numpy array of floats. """
+    play_result = df['play_result'].astype('category')
+    k_or_bb = df['k_or_bb'].astype('category')
+    play_value = _map_codes(play_result, values)
+    k_or_bb_value = np.where(_in_set(k_or_bb, _UNDEFINED), undefined, _map_codes(k_or_bb, values))
+    return np.where(_in_set(play_result, _UNDEFINED), k_or_bb_value, play_value)
+
+
+def parse_woba(df, weights):
+    """ Given a dataframe of events, and wOBA weights, return the wOBA value for each event. 
+    
+    Returns: pandas.Series of floats representing wOBA. """
+    if isinstance(df, pd.Series):
+        return _from_row(parse_woba, df, weights)
+    return pd.Series(_parse_event_value(df, weights, float('NaN')), index=df.index)
      
     
-def parse_woba_denom(row, denoms):
-    """ Given a row representing a single event, and wOBA denoms, return the wOBA denominator for row. 
+def parse_woba_denom(df, denoms):
+    """ Given a dataframe of events, and wOBA denoms, return the wOBA denominator for each event. 
     
-    Returns: Float representing wOBA denominator. """
-    if row.play_result != 'Undefined':
-        return denoms[row.play_result]
-    else:
-        if row.k_or_bb != 'Undefined':
-            return denoms[row.k_or_bb]
-        else:
-            return 0
+    Returns: pandas.Series of floats representing wOBA denominator. """
+    if isinstance(df, pd.Series):
+        return _from_row(parse_woba_denom, df, denoms)
+    return pd.Series(_parse_event_value(df, denoms, 0), index=df.index)
 
         
-def parse_whiff(row, calls_by_pitch):
-    """ Given a row representing a pitch, and a groupby (by pitch), return the whiff rate for the pitch. 
-    
-    Returns: Float representing whiff rate. """
-    swings = 0
-    whiffs = 0
-    if row.name in calls_by_pitch:
-        if 'StrikeSwinging' in calls_by_pitch[row.name]:
-            whiffs = calls_by_pitch[row.name]['StrikeSwinging']
-            swings += whiffs
-        if 'FoulBall' in calls_by_pitch[row.name]:
-            swings += calls_by_pitch[row.name]['FoulBall']
-        if 'InPlay' in calls_by_pitch[row.name]:
-            swings += calls_by_pitch[row.name]['InPlay']
-        if swings > 0:
-            return whiffs/swings
-        else:
-            return float('NaN')
-    else:
-        return float('NaN')
+def parse_whiff(pt, calls_by_pitch):
+    """ Given a dataframe indexed by pitch type, and calls_by_pitch counts, return the whiff rate for each pitch. 
+    
+    Returns: pandas.Series of whiff rates indexed like pt. """
+    if isinstance(pt, pd.Series):
+        return _from_row(parse_whiff, pt, calls_by_pitch)
+    return _call_rates(calls_by_pitch)['whiff_rate'].reindex(pt.index)
     
     
-def parse_whiff_statcast(row, all_stats):
-    """ Same as parse_whiff() but for statcast data. """
-    all_stats_pitch = all_stats[all_stats['pitch_type']==row.name]
-    whiffs = len(all_stats_pitch[all_stats_pitch['description'].isin(['swinging_strike','swinging_strike_blocked'])])
-    swings = len(all_stats_pitch[all_stats_pitch['description'].isin(['swinging_strike','swinging_strike_blocked',
-                    'hit_into_play', 'hit_into_play_no_out', 'hit_into_play_score', 'foul_tip', 'foul', 'foul_bunt'])])
-    if swings==0:
-        return float('NaN')
-    whiff_rate = whiffs/swings
-    return whiff_rate
+def parse_whiff_statcast(pt, all_stats):
+    """ Same as parse_whiff() but for statcast data, computed for every pitch type in pt (a dataframe indexed by
+    pitch type) with one groupby over all_stats. 
     
+    Returns: pandas.Series of whiff rates indexed like pt. """
+    if isinstance(pt, pd.Series):
+        return _from_row(parse_whiff_statcast, pt, all_stats)
+    desc = all_stats['description'].astype('category')
+    counts = pd.DataFrame({
+        'pitch_type': all_stats['pitch_type'].array,
+        'whiffs': _in_set(desc, _STATCAST_WHIFF),
+        'swings': _in_set(desc, _STATCAST_SWING)
+    }).groupby('pitch_type', observed=True).sum()
+    whiff_rate = counts['whiffs']/counts['swings'].where(counts['swings'] > 0)
+    return whiff_rate.reindex(pt.index)
     
-def parse_putaway(row, calls_by_pitch, statcast=False):
+    
+def parse_putaway(pt, calls_by_pitch, statcast=False):
     """ Parase putaway using same style as above. """
-    total_k = 0
-    total = 0
-    if row.name in calls_by_pitch:
-        for outcome in calls_by_pitch[row.name].index:
-            if not statcast:
-                if outcome == 'StrikeSwinging' or outcome == 'StrikeCalled':
-                    total_k += calls_by_pitch[row.name][outcome]
-            else:
-                if outcome in ['swinging_strike', 'swinging_strike_blocked', 'called_strike']:
-                    total_k += calls_by_pitch[row.name][outcome]
-            total += calls_by_pitch[row.name][outcome] 
-        return total_k/total
-    else:
-        return float('NaN')
+    if isinstance(pt, pd.Series):
+        return _from_row(parse_putaway, pt, calls_by_pitch, statcast=statcast)
+    return _call_rates(calls_by_pitch, statcast=statcast)['putaway_rate'].reindex(pt.index)
     
     
-def parse_prop(row, df, statcast=False):
-    """ Parse pitch frequency. """
-    if not statcast:
-        return len(df[df['tagged_pitch_type']==row.name])/len(df)
-    else:
-        return len(df[df['pitch_type']==row.name])/len(df)
+def parse_prop(pt, df, statcast=False):
+    """ Parse pitch frequency, for every pitch type in pt, from a single value_counts over df. 
+    
+    Returns: pandas.Series of frequencies indexed like pt. """
+    if isinstance(pt, pd.Series):
+        return _from_row(parse_prop, pt, df, statcast=statcast)
+    pitch_col = 'pitch_type' if statcast else 'tagged_pitch_type'
+    return df[pitch_col].value_counts(normalize=True, dropna=False).reindex(pt.index, fill_value=0)
+    
+    
+def pitch_call_rates(df, statcast=False):
+    """ Given a dataframe of pitches, compute whiff and putaway rate for every pitch type at once from a single
+    count_calls_by_pitch() pass. Rates match parse_whiff() and parse_putaway() (or parse_whiff_statcast() with
+    statcast=True), so pass the 2-strike pitches for putaway rate.
+    
+    Returns: pandas.DataFrame indexed by pitch type with whiff_rate and putaway_rate. """
+    return _call_rates(count_calls_by_pitch(df, statcast=statcast), statcast=statcast)
     
     
 def whiff_by_height(pitches, df, heights, putaway=False):
     """ Given pitches of interest and heights delineation and a df representing all pitches, compute stats
-    per-pitch and per-height and plot. Universal strike zone docs described in notebook. """
+    per-pitch and per-height and plot. Heights are (low, high] intervals; they may leave gaps or overlap. Universal
+    strike zone docs described in notebook. """
     
     # "universal" strike zone params
-    lowerb = 18.29/12
-    upperb = lowerb+(25.79/12)
-    leftb = -9.97/12
-    rightb = leftb +(19.94/12)
+    lowerb = _ZONE_BOTTOM
+    upperb = lowerb+_ZONE_HEIGHT
+    leftb = _ZONE_LEFT
+    rightb = leftb+_ZONE_WIDTH
+    
+    plate_height = df['plate_loc_height'].to_numpy()
+    plate_side = df['plate_loc_side'].to_numpy()
+    # bin on the sorted union of all band edges; each band is then a run of consecutive bins
+    edges = np.unique([bound for height in heights for bound in height])
+    bins_by_height = [np.flatnonzero((edges[:-1] >= height[0]) & (edges[1:] <= height[1])) for height in heights]
+    binned = pd.DataFrame({
+        'tagged_pitch_type': df['tagged_pitch_type'].array,
+        'height_bin': np.digitize(plate_height, edges, right=True) - 1,
+        'pitch_call': df['pitch_call'].array,
+        'in_zone': np.logical_and.reduce([plate_height >= lowerb, plate_height <= upperb,
+                                          plate_side >= leftb, plate_side <= rightb])})
+    g = binned.groupby(['tagged_pitch_type', 'height_bin'], observed=True)
+    calls = binned.groupby(['tagged_pitch_type', 'height_bin', 'pitch_call'],
+                           observed=True).size().unstack(fill_value=0)
+    counts = pd.DataFrame({'whiffs': calls.loc[:, calls.columns.isin(_TRACKMAN_WHIFF)].sum(axis=1),
+                           'swings': calls.loc[:, calls.columns.isin(_TRACKMAN_SWING)].sum(axis=1),
+                           'clean': calls.loc[:, calls.columns.isin(_TRACKMAN_PUTAWAY)].sum(axis=1),
+                           'called_str': calls.loc[:, calls.columns.isin(_TRACKMAN_CALLED)].sum(axis=1),
+                           'strikes': g['in_zone'].sum(),
+                           'chances': g.size()})
+    counts = counts.reindex(pd.MultiIndex.from_product([pitches, range(len(edges) - 1)]), fill_value=0).astype(int)
+    rows_by_bin = g.indices
     
-    for pitch in pitches:
+    fig, axes = plt.subplots(len(pitches), len(heights), squeeze=False, sharex=True, sharey=True,
+                             figsize=(4*len(heights), 4*len(pitches)))
+    for i, pitch in enumerate(pitches):
         freqs = {}
-        for height in heights:
+        for j, height in enumerate(heights):
             print('\nINFO FOR ' + str(pitch) + ' at ' + str(height))
-            df_pitch = df[(df['tagged_pitch_type']==pitch) & (df['plate_loc_height'] > height[0]) &
-                         (df['plate_loc_height'] <= height[1])]
-            whiffs = len(df_pitch[df_pitch['pitch_call']=='StrikeSwinging'])
-            swings = len(df_pitch[df_pitch['pitch_call'].isin(['StrikeSwinging', 'InPlay', 'FoulBall'])])
+            band = counts.loc[pitch].iloc[bins_by_height[j]].sum()
+            whiffs, swings, clean, called_str, strikes, chances = (int(c) for c in band)
             if swings > 0:
                 whiff_rate = whiffs/swings
             else:
                 whiff_rate = float('NaN')
-            clean = len(df_pitch[df_pitch['pitch_call'].isin(['StrikeSwinging', 'StrikeCalled'])])
-            chances = len(df_pitch)
-            called_str = len(df_pitch[df_pitch['pitch_call']=='StrikeCalled'])
-            strikes = len(df_pitch[(df_pitch['plate_loc_height'] >= lowerb) & (df_pitch['plate_loc_height'] <= upperb) &
-                         (df_pitch['plate_loc_side'] >= leftb) & (df_pitch['plate_loc_side'] <= rightb)])
             print(pitch + ' clean rate: ' + str(clean/chances))
             print(pitch + ' whiff rate: ' + str(whiff_rate))
             print(pitch + ' whiffs: ' + str(whiffs))
@@ -182,18 +480,22 @@ def whiff_by_height(pitches, df, heights, putaway=False):
             print(pitch + ' swings: ' + str(swings))
             print(pitch + ' strikes: ' + str(strikes))
             print(pitch + ' chances: ' + str(chances))
-            freqs[height] = len(df_pitch)
+            freqs[height] = chances
 
             # plot
-            df_pitch.plot(x='plate_loc_side', y='plate_loc_height', kind='scatter')
-            ax = plt.gca()
-            rect = patches.Rectangle((-9.97/12,18.29/12),19.94/12,25.79/12,linewidth=1,edgecolor='r',facecolor='none')
-            ax.add_patch(rect)
-            plt.xlim([-3, 3])
-            plt.ylim([0, 6])
-            plt.show()
+            rows = np.concatenate([rows_by_bin.get((pitch, b), np.array([], dtype=np.intp))
+                                   for b in bins_by_height[j]] + [np.array([], dtype=np.intp)])
+            ax = axes[i, j]
+            ax.scatter(plate_side[rows], plate_height[rows])
+            ax.add_patch(patches.Rectangle((_ZONE_LEFT, _ZONE_BOTTOM), _ZONE_WIDTH, _ZONE_HEIGHT, linewidth=1,
+                                           edgecolor='r', facecolor='none'))
+            ax.set_title(str(pitch) + ' at ' + str(height))
+            ax.set_xlabel('plate_loc_side')
+            ax.set_ylabel('plate_loc_height')
         total = sum(freqs.values())
         for height in freqs:
             freqs[height] /= total
         print("frequencies for " + pitch + ' by height: ' + str(freqs))
-        
\ No newline at end of file
+    plt.xlim([-3, 3])
+    plt.ylim([0, 6])
+    plt.show()